@@ -3,13 +3,16 @@
 #include <SPIFFS.h>
 
 #define SPI_CS 5
-#define BUFFER_SIZE 256
+#define BUFFER_SIZE 4096
+#define PAGE_SIZE 256
 #define ACK 0xAA
 #define NACK 0x55
 
 SPIClass spi(HSPI);
 
 void setup() {
+  // Room for the host's write-ahead window of checksummed chunks.
+  Serial.setRxBufferSize(4 * (BUFFER_SIZE + 1) + 64);
   Serial.begin(500000);
   spi.begin(18, 19, 23, SPI_CS);
   pinMode(SPI_CS, OUTPUT);
@@ -36,10 +39,25 @@ void loop() {
       case 'D':
         fullDetect();
         break;
+
+      case 'B':
+        setBaudrate();
+        break;
+
+      case 'S':
+        eraseSector();
+        break;
     }
   }
 }
 
+void setBaudrate() {
+  uint32_t baud = readU32();
+  Serial.write(ACK);
+  Serial.flush();
+  Serial.updateBaudRate(baud);
+}
+
 void fullDetect() {
   waitBusy();
   digitalWrite(SPI_CS, LOW);
@@ -114,6 +132,12 @@ void readFlash() {
   Serial.write(ACK);
   
   while (len > 0) {
+    if (Serial.available()) {
+      // The host never sends during a dump, so any byte means it
+      // abandoned the stream; stop and resynchronize.
+      drainSerial();
+      return;
+    }
     uint32_t chunk = (len > BUFFER_SIZE) ? BUFFER_SIZE : len;
     digitalWrite(SPI_CS, LOW);
     spi.transfer(0x03);
@@ -139,12 +163,42 @@ void writeFlash() {
   
   while (len > 0) {
     uint32_t chunk = (len > BUFFER_SIZE) ? BUFFER_SIZE : len;
-    Serial.readBytes(buffer, chunk);
-    writePage(addr, buffer, chunk);
+    if (Serial.readBytes(buffer, chunk) != chunk) {
+      // Host cancelled or died mid-chunk; never program a partial
+      // buffer padded with stale bytes.
+      Serial.write(NACK);
+      drainSerial();
+      return;
+    }
+
+    uint8_t expected;
+    if (Serial.readBytes(&expected, 1) != 1) {
+      Serial.write(NACK);
+      drainSerial();
+      return;
+    }
+    uint8_t sum = 0;
+    for (uint32_t i = 0; i < chunk; i++) {
+      sum += buffer[i];
+    }
+    if (sum != expected) {
+      Serial.write(NACK);
+      // The host may have a window of further chunks already in
+      // flight; swallow them so loop() never sees image bytes as
+      // opcodes (a stray 'E' would erase the chip).
+      drainSerial();
+      return;
+    }
+
+    for (uint32_t off = 0; off < chunk; off += PAGE_SIZE) {
+      uint32_t n = (chunk - off > PAGE_SIZE) ? PAGE_SIZE : chunk - off;
+      writePage(addr + off, buffer + off, n);
+    }
+    Serial.write(ACK);
     addr += chunk;
     len -= chunk;
   }
-  
+
   Serial.write(ACK);
 }
 
@@ -166,6 +220,23 @@ void writePage(uint32_t addr, uint8_t *data, uint32_t len) {
   waitBusy();
 }
 
+void eraseSector() {
+  uint32_t addr = readU32();
+  digitalWrite(SPI_CS, LOW);
+  spi.transfer(0x06);
+  digitalWrite(SPI_CS, HIGH);
+  delayMicroseconds(1);
+
+  digitalWrite(SPI_CS, LOW);
+  spi.transfer(0x20);
+  spi.transfer(addr >> 16);
+  spi.transfer(addr >> 8);
+  spi.transfer(addr);
+  digitalWrite(SPI_CS, HIGH);
+  waitBusy();
+  Serial.write(ACK);
+}
+
 void eraseChip() {
   digitalWrite(SPI_CS, LOW);
   spi.transfer(0x06);
@@ -179,6 +250,18 @@ void eraseChip() {
   Serial.write(ACK);
 }
 
+void drainSerial() {
+  // Discard incoming bytes until the line has been idle for 200 ms;
+  // used after an aborted transfer whose payload is still arriving.
+  uint32_t last = millis();
+  while (millis() - last < 200) {
+    if (Serial.available()) {
+      Serial.read();
+      last = millis();
+    }
+  }
+}
+
 void waitBusy() {
   uint8_t status;
   do {
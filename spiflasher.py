@@ -1,12 +1,42 @@
+import hashlib
+import os
+import queue
+import struct
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import serial
 import serial.tools.list_ports
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QComboBox, QProgressBar, QFileDialog,
-    QMessageBox, QGroupBox, QFormLayout
+    QMessageBox, QGroupBox, QFormLayout, QCheckBox
 )
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+
+# One serial write per flash sector instead of per 256-byte page; the
+# firmware consumes the stream in page-sized readBytes() calls, so no
+# protocol change is needed.
+CHUNK_SIZE = 4096
+
+# How many checksummed chunks may be on the wire before we collect
+# their ACKs; the firmware RX buffer is sized to hold this window.
+WRITE_WINDOW = 4
+
+ACK = b'\xAA'
+
+# Rate the firmware boots at; every session starts here and may
+# negotiate up with the 'B' command.
+BOOT_BAUDRATE = 500000
+BAUDRATES = [500000, 921600, 1000000, 2000000, 3000000]
+
+# Compiled once; <BII> is the opcode + start address + length command
+# header, <I> the little-endian capacity word.
+_CMD_HEADER = struct.Struct('<BII')
+_U32 = struct.Struct('<I')
 
 MANUFACTURERS = {
     0xEF: "Winbond",
@@ -36,106 +66,566 @@ DEVICE_CAPACITY = {
     0x90: "32MB",
 }
 
-class SerialThread(QThread):
+# Flat 256-entry tables indexed by the raw ID byte; None means unknown.
+_MFG_BY_ID = [None] * 256
+for _id, _name in MANUFACTURERS.items():
+    _MFG_BY_ID[_id] = _name
+
+_CAPACITY_BY_ID = [None] * 256
+for _id, _name in DEVICE_CAPACITY.items():
+    _CAPACITY_BY_ID[_id] = _name
+del _id, _name
+
+def _tune_latency_timer(port):
+    """Best-effort drop of the USB-serial latency timer to 1 ms.
+
+    FTDI bridges default to 16 ms, which dominates every small
+    detect/erase handshake. Ports without a tunable timer (CDC-ACM,
+    missing driver support) silently skip.
+    """
+    try:
+        if sys.platform.startswith('linux'):
+            name = os.path.basename(port)
+            with open(f"/sys/bus/usb-serial/devices/{name}/latency_timer", 'w') as f:
+                f.write('1')
+        elif sys.platform == 'win32':
+            # Only touch the adapter backing the selected port, and
+            # only when it really is FTDI (VID 0x0403).
+            info = next((p for p in serial.tools.list_ports.comports()
+                         if p.device == port), None)
+            if info is None or info.vid != 0x0403 or not info.serial_number:
+                return
+            import ctypes
+            FT_OPEN_BY_SERIAL_NUMBER = 1
+            ftd2xx = ctypes.windll.ftd2xx
+            handle = ctypes.c_void_p()
+            if ftd2xx.FT_OpenEx(info.serial_number.encode(),
+                                FT_OPEN_BY_SERIAL_NUMBER,
+                                ctypes.byref(handle)) == 0:
+                ftd2xx.FT_SetLatencyTimer(handle, 1)
+                ftd2xx.FT_Close(handle)
+    except (OSError, AttributeError):
+        pass
+
+class DetectCmd:
+    """Read the JEDEC ID and capacity."""
+
+
+class ReadCmd:
+    """Dump *size* bytes of flash into the file at *path*."""
+
+    done = "Read complete!"
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+class WriteCmd:
+    """Program the image at *path* (*size* bytes) into flash.
+
+    chunk_size is kept equal to the chip's erase-sector size so every
+    chunk the firmware programs or compares sits on a sector boundary.
+    """
+
+    done = "Write complete!"
+
+    def __init__(self, path, size, differential=False, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.size = size
+        self.differential = differential
+        self.chunk_size = chunk_size
+
+
+class EraseCmd:
+    """Erase the whole chip."""
+
+    done = "Chip erased!"
+
+
+class SerialWorker(QThread):
+    """Long-lived owner of the serial port.
+
+    The UI posts command objects onto a queue; the worker opens the
+    port once per session — avoiding the per-click open latency and
+    the DTR toggle that resets Arduino-class boards — then executes
+    commands until stopped.
+    """
+
     progress = pyqtSignal(int)
-    detect_result = pyqtSignal(bytes, int)
-    finished = pyqtSignal()
+    # 7 bytes: 3-byte JEDEC ID followed by the little-endian capacity;
+    # one compact payload to marshal instead of two Python objects.
+    detect_result = pyqtSignal(bytes)
+    finished = pyqtSignal(str)
     error = pyqtSignal(str)
 
-    def __init__(self, port, command, file_path=None, flash_size=None):
+    def __init__(self, port, baudrate=1000000):
         super().__init__()
         self.port = port
-        self.command = command
-        self.file_path = file_path
-        self.flash_size = flash_size
+        self.baudrate = baudrate
+        self._commands = queue.Queue()
+        self._abort = False
+        # Reused across the whole dump; readinto() fills slices of this
+        # instead of allocating a bytes object per chunk.
+        self._rx = bytearray(1 << 20)
 
-    def run(self):
+    def submit(self, cmd):
+        """Queue a command for execution on the worker thread."""
+        self._commands.put(cmd)
+
+    def cancel(self):
+        """Ask the running transfer to stop at the next loop iteration."""
+        self._abort = True
+
+    def stop(self):
+        """Shut the worker down and release the port."""
+        self._abort = True
+        self.requestInterruption()
+        self._commands.put(None)
+
+    def _cancelled(self):
+        return self._abort or self.isInterruptionRequested()
+
+    def _wait_ack(self, ser, timeout=2.0):
+        """Wait up to *timeout* seconds for the ACK byte.
+
+        The port timeout is kept short so loops stay responsive; this
+        polls read_until against its own deadline. Returns False on a
+        NACK, on cancellation, or if the deadline passes.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            resp = ser.read_until(ACK, 1)
+            if resp:
+                return resp == ACK
+            if self._cancelled() or time.monotonic() >= deadline:
+                return False
+
+    def _read_exact(self, ser, count, timeout=2.0):
+        """Read exactly *count* bytes, polling past the short port timeout."""
+        data = bytearray()
+        deadline = time.monotonic() + timeout
+        while len(data) < count and time.monotonic() < deadline:
+            data += ser.read(count - len(data))
+        return bytes(data)
+
+    def _read_chunks(self, chunks, cmd):
+        """File-reader side of the pipelined write.
+
+        Fills *chunks* with checksummed payloads ahead of the serial
+        writer and finishes with None — or with the exception if the
+        image became unreadable, so the consumer never waits forever.
+        Stops early if the transfer is cancelled or aborts.
+        """
         try:
-            with serial.Serial(self.port, 500000, timeout=2) as ser:
-                if self.command == 'D':
-                    ser.write(b'D')
-                    jedec = ser.read(3)
-                    if len(jedec) != 3:
-                        self.error.emit("JEDEC ID read failed")
+            buf = bytearray(cmd.chunk_size + 1)
+            view = memoryview(buf)
+            data = view[:cmd.chunk_size]
+            with open(cmd.path, 'rb') as f:
+                while True:
+                    n = f.readinto(data)
+                    if n == 0:
+                        break
+                    buf[n] = sum(data[:n]) & 0xFF
+                    if not self._put_chunk(chunks, bytes(view[:n + 1])):
                         return
-                        
-                    capacity_bytes = ser.read(4)
-                    if len(capacity_bytes) != 4:
-                        self.error.emit("Capacity read failed")
+        except Exception as e:
+            self._put_chunk(chunks, e)
+            return
+        self._put_chunk(chunks, None)
+
+    def _put_chunk(self, chunks, item):
+        while not self._cancelled():
+            try:
+                chunks.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _drain(self, ser, idle=0.3):
+        """Discard incoming bytes until the line has been idle.
+
+        Host-side analogue of the firmware's drainSerial(): after an
+        'R' stream is abandoned the firmware may still be sending,
+        and reset_input_buffer() alone would leave the remnants to be
+        parsed as the next command's reply.
+        """
+        deadline = time.monotonic() + idle
+        while time.monotonic() < deadline:
+            if ser.read(ser.in_waiting or 1):
+                deadline = time.monotonic() + idle
+
+    def _abort_stream(self, ser):
+        """Stop an in-flight 'R' stream and resynchronize the line.
+
+        Any byte from the host makes readFlash() abandon its stream;
+        0x00 is not a command opcode, so it is harmless if the
+        firmware is already back in its command loop.
+        """
+        ser.write(b'\x00')
+        self._drain(ser)
+
+    def _resync_read(self, ser, offset, total):
+        """Ask the firmware to restart an 'R' stream at *offset*.
+
+        The read header already carries a start address, so recovery
+        after a stall is just a fresh command for the remainder.
+        """
+        self._abort_stream(ser)
+        ser.write(_CMD_HEADER.pack(ord('R'), offset, total - offset))
+        return self._wait_ack(ser)
+
+    def _negotiate_baudrate(self, ser):
+        """Probe the firmware's 'B' command to leave the boot rate.
+
+        The host always opens at BOOT_BAUDRATE; on ACK both ends
+        switch in place. The firmware, however, keeps a negotiated
+        rate across host restarts (DTR is held off, so nothing resets
+        the board), so a silent first probe may just mean it is
+        already listening at the target rate — re-probe there before
+        concluding the command is unsupported and falling back to the
+        boot rate.
+        """
+        if self.baudrate == BOOT_BAUDRATE:
+            return
+        ser.write(b'B' + _U32.pack(self.baudrate))
+        if self._wait_ack(ser):
+            ser.baudrate = self.baudrate
+            return
+        ser.baudrate = self.baudrate
+        ser.reset_input_buffer()
+        ser.write(b'B' + _U32.pack(self.baudrate))
+        if not self._wait_ack(ser):
+            ser.baudrate = BOOT_BAUDRATE
+            ser.reset_input_buffer()
+
+    def _differential_write(self, ser, cmd):
+        """Send only the 4 KB windows that differ from the chip.
+
+        One streaming read pass hashes the current contents window by
+        window (first half of the progress bar); the second pass
+        compares against the file and sends each differing window as
+        its own addressed 'W' command. Windows that already match
+        never touch the wire or the flash.
+        """
+        total = cmd.size
+        ser.write(_CMD_HEADER.pack(ord('R'), 0, total))
+        if not self._wait_ack(ser):
+            self.error.emit("ACK failed")
+            return
+
+        flash_hashes = []
+        buf = bytearray(cmd.chunk_size)
+        view = memoryview(buf)
+        received = 0
+        last_pct = -1
+        while received < total:
+            if self._cancelled():
+                self._abort_stream(ser)
+                return
+            window = min(cmd.chunk_size, total - received)
+            filled = 0
+            while filled < window:
+                n = ser.readinto(view[filled:window])
+                if n == 0:
+                    self._abort_stream(ser)
+                    self.error.emit("Read timed out")
+                    return
+                filled += n
+            flash_hashes.append(
+                hashlib.blake2b(view[:window], digest_size=8).digest())
+            received += window
+            pct = (received * 50) // total
+            if pct != last_pct:
+                self.progress.emit(pct)
+                last_pct = pct
+
+        buf = bytearray(cmd.chunk_size + 1)
+        view = memoryview(buf)
+        data = view[:cmd.chunk_size]
+        done = 0
+        with open(cmd.path, 'rb') as f:
+            for index, chip_hash in enumerate(flash_hashes):
+                if self._cancelled():
+                    return
+                n = f.readinto(data)
+                if n == 0:
+                    break
+                done += n
+                if hashlib.blake2b(data[:n], digest_size=8).digest() != chip_hash:
+                    addr = index * cmd.chunk_size
+                    # NOR programming can only clear bits, so the
+                    # sector must be erased before it is rewritten;
+                    # without this a differing window on an unerased
+                    # chip would end up as old AND new.
+                    ser.write(b'S' + _U32.pack(addr))
+                    if not self._wait_ack(ser, timeout=5.0):
+                        self.error.emit(
+                            f"Sector erase failed at offset {addr}")
                         return
-                        
-                    capacity = int.from_bytes(capacity_bytes, 'little')
-                    self.detect_result.emit(jedec, capacity)
-                    
-                elif self.command == 'R':
-                    ser.write(b'R')
-                    ser.write(b'\x00\x00\x00\x00')
-                    ser.write(self.flash_size.to_bytes(4, 'little'))
-                    if ser.read(1) != bytes([0xAA]):
+                    ser.write(_CMD_HEADER.pack(ord('W'), addr, n))
+                    if not self._wait_ack(ser):
                         self.error.emit("ACK failed")
                         return
-                    
-                    with open(self.file_path, 'wb') as f:
-                        total = self.flash_size
-                        received = 0
-                        while received < total:
-                            chunk = ser.read(min(4096, total - received))
-                            f.write(chunk)
-                            received += len(chunk)
-                            self.progress.emit(int(received / total * 100))
-                    self.finished.emit()
-                    
-                elif self.command == 'W':
-                    ser.write(b'W')
-                    ser.write(b'\x00\x00\x00\x00')
-                    ser.write(self.flash_size.to_bytes(4, 'little'))
-                    if ser.read(1) != bytes([0xAA]):
-                        self.error.emit("ACK failed")
+                    buf[n] = sum(data[:n]) & 0xFF
+                    ser.write(view[:n + 1])
+                    if not self._wait_ack(ser, timeout=5.0):
+                        self.error.emit(
+                            f"Chunk checksum failed at offset {addr}")
                         return
-                    
-                    with open(self.file_path, 'rb') as f:
-                        total = self.flash_size
-                        sent = 0
-                        while sent < total:
-                            chunk = f.read(256)
-                            ser.write(chunk)
-                            sent += len(chunk)
-                            self.progress.emit(int(sent / total * 100))
-                    if ser.read(1) == bytes([0xAA]):
-                        self.finished.emit()
-                    else:
+                    if not self._wait_ack(ser):
                         self.error.emit("Write failed")
-                        
-                elif self.command == 'E':
-                    ser.write(b'E')
-                    if ser.read(1) == bytes([0xAA]):
-                        self.finished.emit()
-                    else:
-                        self.error.emit("Erase failed")
-                    
+                        return
+                pct = 50 + (done * 50) // total
+                if pct != last_pct:
+                    self.progress.emit(pct)
+                    last_pct = pct
+        self.finished.emit(cmd.done)
+
+    def run(self):
+        try:
+            with serial.Serial(self.port, BOOT_BAUDRATE, timeout=0.2,
+                               write_timeout=2,
+                               dsrdtr=False, rtscts=False) as ser:
+                if sys.platform == 'win32':
+                    # Let the driver coalesce more bytes per transfer;
+                    # only the Win32 backend implements this.
+                    try:
+                        ser.set_buffer_size(rx_size=1 << 20)
+                    except (AttributeError, serial.SerialException):
+                        pass
+                _tune_latency_timer(self.port)
+                self._negotiate_baudrate(ser)
+                while not self.isInterruptionRequested():
+                    try:
+                        cmd = self._commands.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    if cmd is None:
+                        break
+                    self._abort = False
+                    # A failed or cancelled transfer can leave the
+                    # firmware mid-stream; without a purge the stale
+                    # bytes would be parsed as this command's reply.
+                    ser.reset_input_buffer()
+                    self._execute(ser, cmd)
         except Exception as e:
             self.error.emit(f"Port error: {str(e)}")
+        finally:
+            # A write that raised mid-transfer leaves the producer
+            # thread blocked on a full chunk queue; flag the abort so
+            # _put_chunk gives up and the thread exits.
+            self._abort = True
+
+    def _execute(self, ser, cmd):
+        if isinstance(cmd, DetectCmd):
+            self._detect(ser)
+        elif isinstance(cmd, ReadCmd):
+            self._read(ser, cmd)
+        elif isinstance(cmd, WriteCmd):
+            if cmd.differential:
+                self._differential_write(ser, cmd)
+            else:
+                self._write(ser, cmd)
+        elif isinstance(cmd, EraseCmd):
+            self._erase(ser, cmd)
+
+    def _detect(self, ser):
+        ser.write(b'D')
+        jedec = self._read_exact(ser, 3)
+        if len(jedec) != 3:
+            self.error.emit("JEDEC ID read failed")
+            return
+
+        capacity_bytes = self._read_exact(ser, 4)
+        if len(capacity_bytes) != 4:
+            self.error.emit("Capacity read failed")
+            return
+
+        self.detect_result.emit(jedec + capacity_bytes)
+
+    def _read(self, ser, cmd):
+        # Opcode, start address and length in one write so the
+        # command goes out as a single frame.
+        ser.write(_CMD_HEADER.pack(ord('R'), 0, cmd.size))
+        if not self._wait_ack(ser):
+            self.error.emit("ACK failed")
+            return
+
+        with open(cmd.path, 'wb') as f, \
+                ThreadPoolExecutor(max_workers=1) as writer:
+            total = cmd.size
+            received = 0
+            buf = self._rx
+            view = memoryview(buf)
+            # File writes happen off this thread so a slow
+            # filesystem can't stall the serial consumer; at
+            # most 4 chunks are in flight before we block.
+            pending = deque()
+            last_pct = -1
+            retries = 0
+            while received < total:
+                if self._cancelled():
+                    self._abort_stream(ser)
+                    return
+                try:
+                    # Take whatever the OS already buffered in
+                    # one go; when the pipe is empty, block for
+                    # a single byte rather than a full chunk.
+                    avail = ser.in_waiting or 1
+                    n = ser.readinto(view[:min(avail, len(buf), total - received)])
+                    port_lost = False
+                except serial.SerialException:
+                    n = 0
+                    port_lost = True
+                if n == 0:
+                    # Transient stalls and flaky USB links get
+                    # a few resync attempts with backoff before
+                    # the transfer is abandoned.
+                    retries += 1
+                    if retries > 3:
+                        self._abort_stream(ser)
+                        self.error.emit(
+                            f"Read stalled at offset {received}")
+                        return
+                    time.sleep(0.2 * (2 ** (retries - 1)))
+                    if port_lost:
+                        ser.close()
+                        ser.baudrate = BOOT_BAUDRATE
+                        ser.open()
+                        self._negotiate_baudrate(ser)
+                    if not self._resync_read(ser, received, total):
+                        self._abort_stream(ser)
+                        self.error.emit(
+                            f"Resync failed at offset {received}")
+                        return
+                    continue
+                retries = 0
+                if len(pending) >= 4:
+                    pending.popleft().result()
+                pending.append(writer.submit(f.write, bytes(view[:n])))
+                received += n
+                pct = (received * 100) // total
+                if pct != last_pct:
+                    self.progress.emit(pct)
+                    last_pct = pct
+            while pending:
+                pending.popleft().result()
+            f.flush()
+        self.finished.emit(cmd.done)
+
+    def _write(self, ser, cmd):
+        ser.write(_CMD_HEADER.pack(ord('W'), 0, cmd.size))
+        if not self._wait_ack(ser):
+            self.error.emit("ACK failed")
+            return
+
+        # File reads happen on a producer thread so the
+        # serial writer never waits on the disk, and up to
+        # WRITE_WINDOW chunks ride the wire before we stop
+        # to collect their ACKs. While the chip programs
+        # one chunk the next ones are already in transit.
+        total = cmd.size
+        chunks = queue.Queue(maxsize=2 * WRITE_WINDOW)
+        reader = threading.Thread(
+            target=self._read_chunks, args=(chunks, cmd), daemon=True)
+        reader.start()
+        sent = 0
+        last_pct = -1
+        offsets = deque()
+        while True:
+            if self._cancelled():
+                return
+            try:
+                item = chunks.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                self._abort = True
+                self.error.emit(f"Image read failed: {item}")
+                return
+            if len(offsets) >= WRITE_WINDOW:
+                # Page-programming a 4 KB chunk takes tens
+                # of ms; allow a generous deadline.
+                if not self._wait_ack(ser, timeout=5.0):
+                    self._abort = True
+                    # Discard whatever acks are still in flight from
+                    # the rest of the window.
+                    ser.reset_input_buffer()
+                    self.error.emit(
+                        f"Chunk checksum failed at offset {offsets[0]}")
+                    return
+                offsets.popleft()
+            ser.write(item)
+            offsets.append(sent)
+            sent += len(item) - 1
+            pct = (sent * 100) // total
+            if pct != last_pct:
+                self.progress.emit(pct)
+                last_pct = pct
+        while offsets:
+            if not self._wait_ack(ser, timeout=5.0):
+                ser.reset_input_buffer()
+                self.error.emit(
+                    f"Chunk checksum failed at offset {offsets[0]}")
+                return
+            offsets.popleft()
+        if self._wait_ack(ser):
+            self.finished.emit(cmd.done)
+        else:
+            self.error.emit("Write failed")
+
+    def _erase(self, ser, cmd):
+        ser.write(b'E')
+        # Chip erase on large parts can run for a minute;
+        # the firmware only ACKs once the chip reads ready.
+        if self._wait_ack(ser, timeout=120.0):
+            self.finished.emit(cmd.done)
+        else:
+            self.error.emit("Erase failed")
 
 class FlashUtility(QMainWindow):
     def __init__(self):
         super().__init__()
         self.capacity = 0
+        # Erase-sector size the transfer chunks are aligned to; every
+        # part in DEVICE_CAPACITY uses 4 KB sectors, so detect simply
+        # confirms the default for now.
+        self.sector_size = CHUNK_SIZE
         self.manufacturer = "Unknown"
         self.part_number = "Unknown"
         self.jedec_id = bytes(3)
+        # Worker progress lands here; a ~30 Hz timer repaints the bar
+        # so a fast transfer can't flood the event loop with redraws.
+        self._pending_pct = 0
+        self._progress_timer = QTimer(self)
+        self._progress_timer.setInterval(33)
+        self._progress_timer.timeout.connect(self._flush_progress)
         self.initUI()
-        self.serial_thread = None
+        self.serial_worker = None
 
     def initUI(self):
         self.setWindowTitle("SPI Flash Programmer")
         self.setGeometry(100, 100, 500, 400)
         
         self.port_combo = QComboBox()
+        self.baud_combo = QComboBox()
+        for rate in BAUDRATES:
+            self.baud_combo.addItem(str(rate))
+        self.baud_combo.setCurrentText("1000000")
         self.btn_refresh = QPushButton("Refresh")
         self.btn_detect = QPushButton("Detect Flash")
         self.btn_read = QPushButton("Read Flash")
         self.btn_write = QPushButton("Write Flash")
         self.btn_erase = QPushButton("Erase Chip")
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setEnabled(False)
+        self.chk_differential = QCheckBox("Differential write")
+        self.chk_differential.setToolTip(
+            "Read the chip first and only write 4 KB blocks that differ")
         self.progress = QProgressBar()
         self.status = QLabel("Disconnected")
         
@@ -157,6 +647,8 @@ class FlashUtility(QMainWindow):
         port_layout = QHBoxLayout()
         port_layout.addWidget(QLabel("COM Port:"))
         port_layout.addWidget(self.port_combo)
+        port_layout.addWidget(QLabel("Baud:"))
+        port_layout.addWidget(self.baud_combo)
         port_layout.addWidget(self.btn_refresh)
         
         layout.addLayout(port_layout)
@@ -169,9 +661,11 @@ class FlashUtility(QMainWindow):
         btn_layout.addWidget(self.btn_read)
         btn_layout.addWidget(self.btn_write)
         btn_layout.addWidget(self.btn_erase)
-        
+        btn_layout.addWidget(self.btn_cancel)
+
         layout.addLayout(btn_layout)
-        
+        layout.addWidget(self.chk_differential)
+
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
@@ -181,9 +675,71 @@ class FlashUtility(QMainWindow):
         self.btn_read.clicked.connect(self.read_flash)
         self.btn_write.clicked.connect(self.write_flash)
         self.btn_erase.clicked.connect(self.erase_chip)
-        
+        self.btn_cancel.clicked.connect(self.cancel_transfer)
+
         self.refresh_ports()
 
+    def _queue_progress(self, pct):
+        self._pending_pct = pct
+
+    def _flush_progress(self):
+        self.progress.setValue(self._pending_pct)
+
+    def _stop_progress_timer(self):
+        self._progress_timer.stop()
+        self._flush_progress()
+        self.btn_cancel.setEnabled(False)
+
+    def cancel_transfer(self):
+        # The worker returns from a cancelled transfer without a
+        # finished or error signal, so settle the UI here.
+        if self.serial_worker is not None:
+            self.serial_worker.cancel()
+        self._stop_progress_timer()
+        self.status.setText("Operation cancelled")
+
+    def _operation_finished(self, message):
+        self._stop_progress_timer()
+        self.status.setText(message)
+
+    def _worker(self):
+        """Return the persistent port worker.
+
+        The port is opened once and kept open across operations so a
+        click doesn't pay the open latency (or reset the board via
+        DTR); the worker is only recreated when the selected port or
+        baud rate changes.
+        """
+        port = self.port_combo.currentText()
+        if not port:
+            QMessageBox.critical(self, "Error", "Select a COM port")
+            return None
+        baudrate = int(self.baud_combo.currentText())
+        worker = self.serial_worker
+        if (worker is None or not worker.isRunning()
+                or worker.port != port or worker.baudrate != baudrate):
+            self._stop_worker()
+            worker = SerialWorker(port, baudrate=baudrate)
+            worker.detect_result.connect(
+                self.process_detect, type=Qt.QueuedConnection)
+            worker.progress.connect(
+                self._queue_progress, type=Qt.QueuedConnection)
+            worker.finished.connect(
+                self._operation_finished, type=Qt.QueuedConnection)
+            worker.error.connect(
+                self.show_error, type=Qt.QueuedConnection)
+            worker.error.connect(
+                self._stop_progress_timer, type=Qt.QueuedConnection)
+            worker.start()
+            self.serial_worker = worker
+        return worker
+
+    def _stop_worker(self):
+        if self.serial_worker is not None:
+            self.serial_worker.stop()
+            self.serial_worker.wait(2000)
+            self.serial_worker = None
+
     def refresh_ports(self):
         self.port_combo.clear()
         ports = serial.tools.list_ports.comports()
@@ -191,24 +747,21 @@ class FlashUtility(QMainWindow):
             self.port_combo.addItem(port.device)
 
     def detect_flash(self):
-        port = self.port_combo.currentText()
-        if not port:
-            QMessageBox.critical(self, "Error", "Select a COM port")
-            return
-            
-        self.serial_thread = SerialThread(port, 'D')
-        self.serial_thread.detect_result.connect(self.process_detect)
-        self.serial_thread.error.connect(self.show_error)
-        self.serial_thread.start()
-        
-    def process_detect(self, jedec, capacity):
+        worker = self._worker()
+        if worker:
+            worker.submit(DetectCmd())
+
+    def process_detect(self, payload):
+        jedec = payload[:3]
+        (capacity,) = _U32.unpack_from(payload, 3)
         self.jedec_id = jedec
         self.capacity = capacity
-        
+        self.sector_size = CHUNK_SIZE
+
         mfg_id = jedec[0]
-        self.manufacturer = MANUFACTURERS.get(mfg_id, "Unknown")
-        
-        self.lbl_jedec.setText(f"{jedec[0]:02X} {jedec[1]:02X} {jedec[2]:02X}")
+        self.manufacturer = _MFG_BY_ID[mfg_id] or "Unknown"
+
+        self.lbl_jedec.setText(jedec.hex(' ').upper())
         self.lbl_manufacturer.setText(self.manufacturer)
         
         if self.capacity == 0:
@@ -219,14 +772,16 @@ class FlashUtility(QMainWindow):
             
         if self.manufacturer == "Winbond":
             device_id = self.jedec_id[1]
-            if device_id in DEVICE_CAPACITY:
-                self.part_number = f"W25Q{device_id:X} ({DEVICE_CAPACITY[device_id]})"
+            capacity_name = _CAPACITY_BY_ID[device_id]
+            if capacity_name:
+                self.part_number = f"W25Q{device_id:X} ({capacity_name})"
             else:
                 self.part_number = f"Unknown Winbond ({mb:.1f}MB)"
         else:
             device_id = self.jedec_id[2]
-            if device_id in DEVICE_CAPACITY:
-                self.part_number = f"{DEVICE_CAPACITY[device_id]} Chip"
+            capacity_name = _CAPACITY_BY_ID[device_id]
+            if capacity_name:
+                self.part_number = f"{capacity_name} Chip"
             else:
                 mb = self.capacity / (1024 * 1024) if self.capacity > 0 else 0
                 self.part_number = f"Unknown ({mb:.1f}MB)"
@@ -247,12 +802,14 @@ class FlashUtility(QMainWindow):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Flash Dump", "", "BIN Files (*.bin)")
         if not file_path:
             return
-            
-        self.serial_thread = SerialThread(port, 'R', file_path, self.capacity)
-        self.serial_thread.progress.connect(self.progress.setValue)
-        self.serial_thread.finished.connect(lambda: self.status.setText("Read complete!"))
-        self.serial_thread.error.connect(self.show_error)
-        self.serial_thread.start()
+
+        worker = self._worker()
+        if not worker:
+            return
+        self._pending_pct = 0
+        self._progress_timer.start()
+        self.btn_cancel.setEnabled(True)
+        worker.submit(ReadCmd(file_path, self.capacity))
 
     def write_flash(self):
         if self.capacity == 0:
@@ -268,36 +825,37 @@ class FlashUtility(QMainWindow):
         if not file_path:
             return
             
-        with open(file_path, 'rb') as f:
-            f.seek(0, 2)
-            size = f.tell()
-            
+        size = os.path.getsize(file_path)
+
         if size > self.capacity:
             QMessageBox.critical(self, "Error", 
                 f"File size ({size} bytes) exceeds flash capacity ({self.capacity} bytes)")
             return
             
-        self.serial_thread = SerialThread(port, 'W', file_path, size)
-        self.serial_thread.progress.connect(self.progress.setValue)
-        self.serial_thread.finished.connect(lambda: self.status.setText("Write complete!"))
-        self.serial_thread.error.connect(self.show_error)
-        self.serial_thread.start()
+        worker = self._worker()
+        if not worker:
+            return
+        self._pending_pct = 0
+        self._progress_timer.start()
+        self.btn_cancel.setEnabled(True)
+        worker.submit(WriteCmd(
+            file_path, size,
+            differential=self.chk_differential.isChecked(),
+            chunk_size=self.sector_size))
 
     def erase_chip(self):
-        port = self.port_combo.currentText()
-        if not port:
-            QMessageBox.critical(self, "Error", "Select a COM port")
-            return
-            
-        self.serial_thread = SerialThread(port, 'E')
-        self.serial_thread.finished.connect(lambda: self.status.setText("Chip erased!"))
-        self.serial_thread.error.connect(self.show_error)
-        self.serial_thread.start()
+        worker = self._worker()
+        if worker:
+            worker.submit(EraseCmd())
 
     def show_error(self, message):
         QMessageBox.critical(self, "Error", message)
         self.status.setText("Operation failed")
 
+    def closeEvent(self, event):
+        self._stop_worker()
+        event.accept()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = FlashUtility()